@@ -1,14 +1,56 @@
 import os
+from itertools import chain
+from queue import Queue
+from threading import Thread
+from typing import Iterator
 
 import markovify
 from atproto import Client
 from atproto_client.request import Request
 from httpx import Timeout
 
-from utils import (MARKOVIFY_MAX_TRIES, MARKOVIFY_STATE_SIZE,
-                   TWEET_COMPILER_CLASSES, create_combined_corpus,
-                   dedupe_combined_tweets_list,
-                   format_tweet_compiler_nicknames, get_villain_quotes_list)
+from utils import (CANDIDATE_SENTENCE_PREFETCH_COUNT, MARKOVIFY_MAX_TRIES,
+                   MARKOVIFY_STATE_SIZE, TWEET_COMPILER_CLASSES,
+                   VILLAIN_QUOTES_REROLL_INTERVAL, create_combined_corpus,
+                   format_tweet_compiler_nicknames, get_villain_quotes_list,
+                   iter_deduped_tweets)
+
+
+def iter_candidate_sentences(full_tweets_list: list[str]) -> Iterator[str]:
+    attempts = 0
+    while True:
+        # recreate corpus every so often to vary the villain quotes, but
+        # rebuilding the whole model is too slow to do on every try
+        if attempts % VILLAIN_QUOTES_REROLL_INTERVAL == 0:
+            villain_quotes_list = get_villain_quotes_list(
+                max_count=len(full_tweets_list)
+            )
+            corpus = create_combined_corpus(full_tweets_list, villain_quotes_list)
+            markovifier = markovify.Text(corpus, state_size=MARKOVIFY_STATE_SIZE)
+        attempts += 1
+
+        yield markovifier.make_sentence(tries=MARKOVIFY_MAX_TRIES)
+
+
+def start_generating_candidate_sentences(full_tweets_list: list[str]) -> Queue:
+    """
+    Keep a few sentences ready in the background so the next one is (usually)
+    already made by the time someone finishes reading the current one
+    """
+    candidate_sentences: Queue = Queue(maxsize=CANDIDATE_SENTENCE_PREFETCH_COUNT)
+
+    def generate() -> None:
+        try:
+            for sentence in iter_candidate_sentences(full_tweets_list):
+                candidate_sentences.put(sentence)
+        except Exception as e:
+            # hand it over so whoever's waiting on a sentence gets the error
+            # instead of waiting forever
+            candidate_sentences.put(e)
+
+    # daemon so it doesn't keep the program alive once something gets posted
+    Thread(target=generate, daemon=True).start()
+    return candidate_sentences
 
 
 def main():
@@ -26,26 +68,23 @@ def main():
     bksy_client = Client(request=request)
     bksy_client.login(bksy_username, bksy_app_password)
 
-    full_tweets_list = []
-    for tcc in TWEET_COMPILER_CLASSES:
-        tc = tcc(bksy_client)
-        full_tweets_list.extend(tc.get_all_tweets())
+    all_tweets = chain.from_iterable(
+        tcc(bksy_client).iter_all_tweets() for tcc in TWEET_COMPILER_CLASSES
+    )
+    # dedupe as the tweets come in so only the keepers pile up
+    full_tweets_list = list(iter_deduped_tweets(all_tweets))
 
     if not full_tweets_list:
         raise ValueError(
             f"Couldn't find enough social media posts for {format_tweet_compiler_nicknames()}; cannot generate anything!"
         )
 
-    full_tweets_list = dedupe_combined_tweets_list(full_tweets_list)
-
+    candidate_sentences = start_generating_candidate_sentences(full_tweets_list)
     satisfied = False
     while not satisfied:
-        # recreate corpus to vary the villain quotes
-        villain_quotes_list = get_villain_quotes_list(max_count=len(full_tweets_list))
-        corpus = create_combined_corpus(full_tweets_list, villain_quotes_list)
-        markovifier = markovify.Text(corpus, state_size=MARKOVIFY_STATE_SIZE)
-
-        sentence = markovifier.make_sentence(tries=MARKOVIFY_MAX_TRIES)
+        sentence = candidate_sentences.get()
+        if isinstance(sentence, Exception):
+            raise sentence
         decision = input(
             f"\nPost this quote? : {sentence}\n(Y to post / N to try again)\n"
         )
@@ -1,15 +1,29 @@
+import hashlib
+import os
 import random
 import re
-from itertools import chain
-from typing import Any, Callable, NamedTuple, Optional, Union
-from urllib.error import HTTPError
-
+import sqlite3
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import chain, islice
+from operator import attrgetter
+from queue import Full, Queue
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Iterator, NamedTuple, Optional, Union
+
+import cv2
+import httpx
+import numpy as np
+import torch
 from atproto import Client
 from atproto_client.models import AppBskyFeedSearchPosts
 from dateutil.parser import ParserError
 from dateutil.parser import parse as attempt_to_parse_date
+from dateutil.parser import parserinfo
 from easyocr import Reader as ImageReader
-from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz, process
 
 from villain_quotes import VILLAIN_QUOTES
 
@@ -20,30 +34,361 @@ BOOKMARKS = "bookmarks"
 LIKES = "likes"
 
 OTHER_REGEXES_TO_CLEAN = frozenset(
-    [
+    re.compile(regex)
+    for regex in [
         r"Twitter for [a-zA-Z]+",
         r"\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2},\s+\d{4}\s*,?\s*\d{1,2}:\d{2}\s*(?:AM|PM)\b",
     ]
 )
+HAS_A_NUMBER_REGEX = re.compile(r"\d")
+WORD_REGEX = re.compile(r"[^\W\d_]+")
+# Every word dateutil understands; it gives up on anything else (except right
+# after "of", which it just skips), but takes its sweet time doing so, so we
+# can check first
+DATEUTIL_WORDS = frozenset(
+    word.lower()
+    for words in chain(
+        parserinfo.JUMP,
+        parserinfo.WEEKDAYS,
+        parserinfo.MONTHS,
+        parserinfo.HMS,
+        parserinfo.AMPM,
+        parserinfo.UTCZONE,
+        parserinfo.PERTAIN,
+    )
+    for word in ((words,) if isinstance(words, str) else words)
+)
 
 QUOTE_INSERTION_WINDOW_SIZE = 5
 TWEET_DEDUPE_FUZZY_MATCH_THRESHOLD = 80
+# Only tweets sharing an LSH bucket of character shingle MinHashes get fuzzy
+# matched. Many small bands catch pretty much every pair over the fuzzy
+# threshold (OCR noise and crops and all) while skipping most other pairs
+TWEET_DEDUPE_CHARACTER_SHINGLE_SIZE = 3
+TWEET_DEDUPE_LSH_BANDS = 21
+
+# MinHash settings for the LSH buckets above
+MINHASH_NUM_PERMUTATIONS = 64
+MINHASH_PRIME = (1 << 31) - 1
+# fixed seed so the same tweets always hash the same way
+_minhash_rng = np.random.default_rng(seed=0)
+MINHASH_A = _minhash_rng.integers(
+    1, MINHASH_PRIME, size=MINHASH_NUM_PERMUTATIONS, dtype=np.uint64
+)
+MINHASH_B = _minhash_rng.integers(
+    0, MINHASH_PRIME, size=MINHASH_NUM_PERMUTATIONS, dtype=np.uint64
+)
 
 MARKOVIFY_STATE_SIZE = (
     2  # this is the default and sadly any more isn't giving me anything yet
 )
 MARKOVIFY_MAX_TRIES = 1000
+# how many sentences to try from one corpus before reshuffling villain quotes in
+VILLAIN_QUOTES_REROLL_INTERVAL = 5
+# The dict keys were just for reference in case anyone was curious :P
+ALL_VILLAIN_QUOTES = tuple(
+    quote for quotes in VILLAIN_QUOTES.values() for quote in quotes
+)
+# how many sentences to have ready ahead of the one being shown
+CANDIDATE_SENTENCE_PREFETCH_COUNT = 3
+
+# sentinel the page prefetching thread uses to say it's done
+NO_MORE_PAGES = object()
+# same thing for the threads reading feeds
+NO_MORE_TWEETS = object()
+
+IMAGE_DOWNLOAD_TIMEOUT = 20.0
+READER_LOCK = Lock()
+# feeds share the one reader; easyocr doesn't say it's safe to use from two
+# threads at once, and two models running at once would only fight over the
+# same GPU (or CPU cores) anyway. so only one feed's images are in the models
+# at a time, while the others download and sort through what they got back
+OCR_LOCK = Lock()
+
+TWEET_TEXT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "bksy_twits", "tweet_texts.sqlite"
+)
+TWEET_TEXT_CACHE_MAX_AGE_DAYS = 30
+# what TweetTextCache.get gives back for images it hasn't seen, since None
+# means we already OCR'd the image and it wasn't a tweet
+NOT_CACHED = object()
+# and for images the text detector didn't think had enough text in them to be
+# worth reading (this run)
+LOOKS_TEXTLESS = object()
+# Bluesky image urls end in the image's CID, a hash of its contents
+BLUESKY_IMAGE_CID_REGEX = re.compile(r"/(baf[a-z2-7]+)(?:@[a-z]+)?$")
 
 
 class ExpectedPostCharacteristicInfo(NamedTuple):
-    regex: Optional[str]
+    # for counts and such (see with_suffixes), the end of a word group to look
+    # for, as a pattern for cleaning it out of the text
+    regex: Optional[re.Pattern]
     position_threshold: int
     from_end: bool
+    # the same thing as plain strings, for a quick str.endswith when looking
+    suffixes: tuple[str, ...] = ()
+
+    @classmethod
+    def with_suffixes(
+        cls, suffixes: tuple[str, ...], position_threshold: int, from_end: bool
+    ) -> "ExpectedPostCharacteristicInfo":
+        """
+        A characteristic that's any word group ending in one of suffixes, with
+        its regex made from them so the two can't disagree
+        """
+        return cls(
+            regex=re.compile(
+                "(?:{})$".format(
+                    "|".join(
+                        re.escape(suffix)
+                        # longest first so cleaning takes all of " Likes", not
+                        # just " Like"
+                        for suffix in sorted(suffixes, key=len, reverse=True)
+                    )
+                )
+            ),
+            position_threshold=position_threshold,
+            from_end=from_end,
+            suffixes=suffixes,
+        )
+
+
+class TweetTextCache:
+    """
+    Remembers what each compiler made of each image url, in memory and in a
+    sqlite file so later runs can skip OCR-ing images they've already read, and
+    how far down each feed it's been read so later runs can stop there.
+    Bluesky images are stored under their CID rather than the whole url, so the
+    same image posted by different accounts is only read once. Since that's
+    content addressed entries don't go stale; images that weren't tweets only
+    expire to keep the file from growing forever. Tweets are kept for as long as
+    runs keep using them, because feeds stop where they were read up to last
+    time, so nothing else would ever find older ones again. If a compiler's
+    tweets do expire (it hasn't run in a while), its feeds get read from the
+    top again. Safe to share between the threads reading different feeds.
+    """
+
+    def __init__(self, compiler_name: str, path: Optional[str], max_age_days: int):
+        self.compiler_name = compiler_name
+        self.memory: dict[str, Any] = {}
+        self.feed_stops: dict[str, str] = {}
+        self.db: Optional[sqlite3.Connection] = None
+        self.lock = Lock()
+        if not path:
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # we do our own locking so any feed's thread can use the connection
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS tweet_texts ("
+                "compiler TEXT NOT NULL, image_url TEXT NOT NULL, tweet_text TEXT, "
+                "cached_at REAL NOT NULL, PRIMARY KEY (compiler, image_url))"
+            )
+            # kept apart from tweet_texts since this is only a guess from a
+            # thumbnail, not a real answer
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS textless_images ("
+                "compiler TEXT NOT NULL, image_url TEXT NOT NULL, "
+                "cached_at REAL NOT NULL, PRIMARY KEY (compiler, image_url))"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS feed_stops ("
+                "compiler TEXT NOT NULL, feed TEXT NOT NULL, post_uri TEXT NOT NULL, "
+                "cached_at REAL NOT NULL, PRIMARY KEY (compiler, feed))"
+            )
+            expired_before = time.time() - max_age_days * 24 * 60 * 60
+            # any feed that's lost tweets has to be read from the top to find
+            # them again
+            self.db.execute(
+                "DELETE FROM feed_stops WHERE cached_at < ? OR compiler IN ("
+                "SELECT compiler FROM tweet_texts "
+                "WHERE tweet_text IS NOT NULL AND cached_at < ?)",
+                (expired_before, expired_before),
+            )
+            for table in ("tweet_texts", "textless_images"):
+                self.db.execute(
+                    f"DELETE FROM {table} WHERE cached_at < ?", (expired_before,)
+                )
+
+    @staticmethod
+    def get_key(image_url: str) -> str:
+        # (the image_url column holds these keys, not necessarily whole urls)
+        cid_match = BLUESKY_IMAGE_CID_REGEX.search(image_url)
+        return cid_match.group(1) if cid_match else image_url
+
+    def get(self, image_url: str) -> Any:
+        key = self.get_key(image_url)
+        if key in self.memory:
+            return self.memory[key]
+        if self.db is None:
+            return NOT_CACHED
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT tweet_text FROM tweet_texts WHERE compiler = ? AND image_url = ?",
+                (self.compiler_name, key),
+            ).fetchone()
+        if row is None:
+            return NOT_CACHED
+        self.memory[key] = row[0]
+        return row[0]
+
+    def get_feed_stop(self, feed: str) -> Optional[str]:
+        """
+        The post (by uri) a feed was read down to last time, if it's been read
+        before; see _iter_tweets_from_api_call
+        """
+        if feed in self.feed_stops or self.db is None:
+            return self.feed_stops.get(feed)
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT post_uri FROM feed_stops WHERE compiler = ? AND feed = ?",
+                (self.compiler_name, feed),
+            ).fetchone()
+        if row is None:
+            return None
+        self.feed_stops[feed] = row[0]
+        return row[0]
+
+    def set_feed_stop(self, feed: str, post_uri: str) -> None:
+        self.feed_stops[feed] = post_uri
+        if self.db is None:
+            return
+
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO feed_stops VALUES (?, ?, ?, ?)",
+                (self.compiler_name, feed, post_uri, time.time()),
+            )
+
+    def iter_tweet_texts(self) -> Iterator[str]:
+        """
+        Every tweet this compiler has found (and not forgotten), this run or
+        earlier ones. They're still in use, so they're remembered for another
+        max_age_days from now
+        """
+        if self.db is None:
+            return (text for text in self.memory.values() if isinstance(text, str))
+
+        with self.lock, self.db:
+            rows = self.db.execute(
+                "SELECT tweet_text FROM tweet_texts "
+                "WHERE compiler = ? AND tweet_text IS NOT NULL",
+                (self.compiler_name,),
+            ).fetchall()
+            self.db.execute(
+                "UPDATE tweet_texts SET cached_at = ? "
+                "WHERE compiler = ? AND tweet_text IS NOT NULL",
+                (time.time(), self.compiler_name),
+            )
+        return (text for (text,) in rows)
+
+    def set(self, image_url: str, tweet_text: Optional[str]) -> None:
+        key = self.get_key(image_url)
+        self.memory[key] = tweet_text
+        if self.db is None:
+            return
+
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO tweet_texts VALUES (?, ?, ?, ?)",
+                (self.compiler_name, key, tweet_text, time.time()),
+            )
+
+    def set_looks_textless(self, image_url: str) -> None:
+        """
+        Remember that the text detector passed on an image. For the rest of
+        this run get gives back LOOKS_TEXTLESS for it; later runs get
+        NOT_CACHED, and looked_textless to say it was passed on before
+        """
+        key = self.get_key(image_url)
+        self.memory[key] = LOOKS_TEXTLESS
+        if self.db is None:
+            return
+
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO textless_images VALUES (?, ?, ?)",
+                (self.compiler_name, key, time.time()),
+            )
+
+    def looked_textless(self, image_url: str) -> bool:
+        """
+        Whether the text detector passed on this image on an earlier run
+        """
+        if self.db is None:
+            return False
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM textless_images WHERE compiler = ? AND image_url = ?",
+                (self.compiler_name, self.get_key(image_url)),
+            ).fetchone()
+        return row is not None
+
+
+class HalfPrecisionModel(torch.nn.Module):
+    """
+    Runs one of easyocr's models in fp16 on the GPU (about twice as fast on
+    anything with tensor cores) and hands back fp32. Autocast rather than
+    .half() so the inputs easyocr builds stay as they are and the numerically
+    touchy ops stay fp32, and casting back because easyocr passes the
+    detector's output straight to opencv, which can't do fp16
+    """
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, *args: Any) -> Any:
+        with torch.autocast("cuda", dtype=torch.float16):
+            output = self.model(*args)
+        if isinstance(output, tuple):
+            return tuple(tensor.float() for tensor in output)
+        return output.float()
 
 
 class TweetCompiler:
     nickname = "bot"
-    max_pages: int = 100
+    # pages are page_size posts each, so these are the same ~5000 posts per
+    # account and ~2500 per hashtag we used to get from 100 of the API's
+    # default-size pages (50 posts for author feeds, 25 for searches)
+    max_pages: int = 50
+    max_hashtag_pages: int = 25
+    # posts to ask for per API call (100 is the most the API will give us)
+    page_size: int = 100
+    # How many API response pages to fetch ahead while OCR-ing the current one
+    page_prefetch_count: int = 4
+    # How many images to hand the OCR reader at once
+    ocr_batch_size: int = 16
+    # Batches smaller than this get read one image at a time instead; padding a
+    # few images out to one size costs more than batching them saves
+    min_ocr_batch_size: int = 8
+    # How many hashtags/accounts to read at the same time. They take turns with
+    # the one OCR reader (see OCR_LOCK), but one feed's paging, downloading and
+    # post-processing can run while another's images are in the model
+    feed_workers: int = 2
+    # How many images to download at the same time
+    image_download_workers: int = 8
+    # Width / height range a post screenshot falls in. Short posts make wide
+    # screenshots and long ones make tall ones, so this only skips the extremes
+    # (banners, panoramas, long scrolling captures) rather than guessing a shape
+    screenshot_aspect_ratio_range: tuple[float, float] = (0.3, 4.0)
+    # Shortest side (in pixels) to shrink images to for a quick look for text
+    # before reading them properly. The shortest side so text in tall phone
+    # screenshots doesn't get shrunk too small for the detector to see
+    text_detection_thumbnail_size: int = 512
+    # Images with fewer bits of text than this aren't worth reading. At least two
+    # of the expected pieces of a screenshot's appearance (see
+    # post_characteristics_probability_threshold) plus the post itself
+    min_screenshot_text_regions: int = 3
+    # languages for the OCR reader to recognize
+    languages: tuple[str, ...] = ("en",)
+    # where to remember OCR results between runs (None to only remember in memory)
+    tweet_text_cache_path: Optional[str] = TWEET_TEXT_CACHE_PATH
     # Within how many positions in the list of extracted image texts we expect to
     # see a desired piece of text (e.g., person's handle or like count)
     position_threshold = 5
@@ -64,13 +409,88 @@ class TweetCompiler:
 
     def __init__(self, bksy_client: Client):
         self.client = bksy_client
-        self.image_reader = ImageReader(["en"])
+        self.http_client = httpx.Client(
+            timeout=IMAGE_DOWNLOAD_TIMEOUT, follow_redirects=True
+        )
+        self.image_download_pool = ThreadPoolExecutor(
+            max_workers=self.image_download_workers
+        )
+        self.tweet_text_cache = TweetTextCache(
+            type(self).__name__,
+            self.tweet_text_cache_path,
+            TWEET_TEXT_CACHE_MAX_AGE_DAYS,
+        )
         if self.hashtags is None and self.accounts is None:
             raise ValueError(
                 "Must specify one or both of hashtags and accounts to search."
             )
         self.untruth_social_generics = self.get_untruth_social_generics()
         self.twix_generics = self.get_twix_generics()
+        # what clean_extracted_texts strips out, as one pattern per kind so each
+        # text only gets scanned once per kind: counts (which take everything
+        # before them with them), then other junk, then names, handles and such
+        # as they are
+        all_generics = [
+            *self.untruth_social_generics.items(),
+            *self.twix_generics.items(),
+        ]
+        # one leading .* for all of them (and only tried from the start) rather
+        # than one per count regex tried from every position, which is quadratic
+        # in the text's length
+        self.count_text_cleaning_regex = re.compile(
+            ".*(?:{})".format(
+                "|".join(
+                    f"(?:{info.regex.pattern.rstrip('$')})"
+                    for _, info in all_generics
+                    if info.regex
+                )
+                # (no counts to look for, so never match)
+                or "(?!)"
+            )
+        )
+        self.text_cleaning_regex = re.compile(
+            "|".join(
+                f"(?:{other_regex.pattern})" for other_regex in OTHER_REGEXES_TO_CLEAN
+            )
+        )
+        self.literal_text_cleaning_regex = re.compile(
+            "|".join(
+                re.escape(identifier)
+                # longest first so a name can't only get partly removed
+                for identifier in sorted(
+                    {identifier for identifier, info in all_generics if not info.regex},
+                    key=len,
+                    reverse=True,
+                )
+            )
+        )
+
+    @property
+    def image_reader(self) -> ImageReader:
+        """
+        Only load the OCR models once something actually needs reading; a run
+        that finds everything in the cache never has to
+        """
+        # feeds run in threads and we don't want two of them loading it at once
+        with READER_LOCK:
+            return TweetCompiler._get_reader(tuple(self.languages))
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _get_reader(languages: tuple[str, ...]) -> ImageReader:
+        """
+        Loading the OCR models is slow and memory hungry, so every compiler
+        wanting the same languages shares one reader
+        """
+        use_gpu = torch.cuda.is_available()
+        # int8 dynamic quantization is a CPU-only speedup. It covers the
+        # recognizer's LSTM/Linear layers; torch can't dynamically quantize
+        # the detector's convolutions, so there's nothing more to do there.
+        reader = ImageReader(list(languages), gpu=use_gpu, quantize=not use_gpu)
+        if use_gpu:
+            reader.detector = HalfPrecisionModel(reader.detector)
+            reader.recognizer = HalfPrecisionModel(reader.recognizer)
+        return reader
 
     def get_untruth_social_generics(self) -> dict[str, ExpectedPostCharacteristicInfo]:
         if (
@@ -85,8 +505,8 @@ class TweetCompiler:
                 position_threshold=self.position_threshold,
                 from_end=False,
             ),
-            REPLIES: ExpectedPostCharacteristicInfo(
-                regex=".* (r|R)epl(y|ies)$",
+            REPLIES: ExpectedPostCharacteristicInfo.with_suffixes(
+                suffixes=(" reply", " Reply", " replies", " Replies"),
                 position_threshold=self.position_threshold + 1,
                 from_end=False,
             ),
@@ -100,14 +520,14 @@ class TweetCompiler:
                 position_threshold=self.position_threshold + 3,
                 from_end=False,
             ),
-            RETWEETS: ExpectedPostCharacteristicInfo(
-                regex=".* ReTruths?$",
+            RETWEETS: ExpectedPostCharacteristicInfo.with_suffixes(
+                suffixes=(" ReTruth", " ReTruths"),
                 position_threshold=self.position_threshold + 1,
                 # re-untruths and likes are typically near bottom of image as opposed to top
                 from_end=True,
             ),
-            LIKES: ExpectedPostCharacteristicInfo(
-                regex=".* (l|L)ikes?$",
+            LIKES: ExpectedPostCharacteristicInfo.with_suffixes(
+                suffixes=(" like", " Like", " likes", " Likes"),
                 position_threshold=self.position_threshold,
                 from_end=True,
             ),
@@ -132,47 +552,28 @@ class TweetCompiler:
             # of screenshots if indeed they made it into the crop
             # DOUBLE CHECK THIS PROBABLY - are they actually separate list
             # items when OCR spits them out for us??
-            RETWEETS: ExpectedPostCharacteristicInfo(
-                regex=".* Reposts?$",
+            RETWEETS: ExpectedPostCharacteristicInfo.with_suffixes(
+                suffixes=(" Repost", " Reposts"),
                 position_threshold=self.position_threshold + 3,
                 from_end=True,
             ),
-            QUOTES: ExpectedPostCharacteristicInfo(
-                regex=".* Quotes?$",
+            QUOTES: ExpectedPostCharacteristicInfo.with_suffixes(
+                suffixes=(" Quote", " Quotes"),
                 position_threshold=self.position_threshold + 2,
                 from_end=True,
             ),
-            LIKES: ExpectedPostCharacteristicInfo(
-                regex=".* Likes?$",
+            LIKES: ExpectedPostCharacteristicInfo.with_suffixes(
+                suffixes=(" Like", " Likes"),
                 position_threshold=self.position_threshold + 1,
                 from_end=True,
             ),
-            BOOKMARKS: ExpectedPostCharacteristicInfo(
-                regex=".* Bookmarks?$",
+            BOOKMARKS: ExpectedPostCharacteristicInfo.with_suffixes(
+                suffixes=(" Bookmark", " Bookmarks"),
                 position_threshold=self.position_threshold,
                 from_end=True,
             ),
         }
 
-    def _within_n_positions(
-        self,
-        word_group: str,
-        word_group_to_index: dict[str, int],
-        n: Optional[int] = None,
-        from_end: bool = False,  # within last n instead of within first n
-    ) -> bool:
-        """
-        determine if word_group is within n positions from front or back of
-        a list based on pre-computed mapping of word_group to its index in the list
-        """
-        if n is None:
-            n = self.position_threshold
-        if word_group not in word_group_to_index:
-            return False
-        if not from_end:
-            return word_group_to_index[word_group] < n
-        return len(word_group_to_index) - word_group_to_index[word_group] <= n
-
     def is_probably_their_platform_post(
         self,
         extracted_image_texts: list[str],
@@ -181,52 +582,88 @@ class TweetCompiler:
     ) -> bool:
         if probability_threshold is None:
             probability_threshold = self.post_characteristics_probability_threshold
-
-        word_group_positions = {}
-        # cumbersome but we especially dont want to overwrite the indexes of these
-        # if somehow they magically appear later in a post body:
-        regex_characteristics_found = {
-            name: False for name, info in platform_generics.items() if info.regex
-        }
-        for index, word_group in enumerate(extracted_image_texts):
-            # stuff with numbers that needs to be normalized (in giant air quotes)
-            for characteristic_name, characteristic in platform_generics.items():
-                if (
-                    characteristic.regex
-                    and not regex_characteristics_found[characteristic_name]
-                    and re.match(characteristic.regex, word_group.strip())
-                ):
-                    word_group_positions[characteristic_name] = index
-                    regex_characteristics_found[characteristic_name] = True
-            # everything else
-            if word_group not in word_group_positions:
-                word_group_positions[word_group] = index
-            # i really don't expect this to happen but i also don't want some later
-            # text than somehow matches an expected intro item to override the index
-            else:
-                word_group_positions[f"{word_group}*"] = index
+        if not platform_generics:
+            return False
 
         # We think it is probably a post from the given plaform if it has certain
         # introductory and/or footer material within the first or last few indexes,
         # respectively, of the extracted image text list
         # screenshot crops could vary a lot, so probability threshold should not be too high
         probability_points = 0
-        total_points = 0
-        for post_characteristic, expected_info in platform_generics.items():
-            if self._within_n_positions(
-                post_characteristic,
-                word_group_positions,
-                n=expected_info.position_threshold,
-                from_end=expected_info.from_end,
-            ):
+        total_points = len(platform_generics)
+
+        # introductory stuff only depends on where it first shows up, so it can be
+        # counted as soon as it's found, and once there's enough of it we're done.
+        # i really don't expect repeats but i also don't want some later text than
+        # somehow matches an expected intro item to count, so it's the first one
+        # that matters
+        for name, (regex, threshold, from_end, _) in platform_generics.items():
+            if not regex and not from_end and name in extracted_image_texts[:threshold]:
                 probability_points += 1
-            total_points += 1
+        if probability_points / total_points >= probability_threshold:
+            return True
 
-        return (
-            probability_points / total_points >= probability_threshold
-            if total_points
-            else False
+        # where each regex characteristic was first found. everything else is
+        # looked up directly, so there's no need to index every word group
+        regex_characteristic_positions: dict[str, int] = {}
+        # cumbersome but we especially dont want to overwrite the indexes of these
+        # if somehow they magically appear later in a post body, so each one is
+        # only looked for until it's found:
+        unfound_regex_characteristics = {
+            name: suffixes
+            for name, (regex, _, _, suffixes) in platform_generics.items()
+            if regex
+        }
+        # word groups that aren't a like count or the like (most of them) are
+        # ruled out by this alone
+        any_characteristic_suffixes = tuple(
+            chain.from_iterable(unfound_regex_characteristics.values())
         )
+        for index, word_group in enumerate(extracted_image_texts):
+            # stuff with numbers that needs to be normalized (in giant air quotes)
+            if (stripped_word_group := word_group.strip()).endswith(
+                any_characteristic_suffixes
+            ):
+                # now figure out which one(s) it was
+                for characteristic_name in [
+                    name
+                    for name, suffixes in unfound_regex_characteristics.items()
+                    if stripped_word_group.endswith(suffixes)
+                ]:
+                    regex_characteristic_positions[characteristic_name] = index
+                    del unfound_regex_characteristics[characteristic_name]
+                    _, threshold, from_end, _ = platform_generics[characteristic_name]
+                    if not from_end and index < threshold:
+                        probability_points += 1
+                        if probability_points / total_points >= probability_threshold:
+                            return True
+                if not unfound_regex_characteristics:
+                    break
+
+        # positions from the end count distinct word groups plus the regex
+        # characteristics found, not list items
+        word_groups = set(extracted_image_texts)
+        position_count = len(word_groups.union(regex_characteristic_positions))
+
+        for name, (regex, threshold, from_end, _) in platform_generics.items():
+            if not from_end and (not regex or name in regex_characteristic_positions):
+                # already counted
+                continue
+
+            position = regex_characteristic_positions.get(name)
+            if position is None:
+                if name not in word_groups:
+                    continue
+                position = extracted_image_texts.index(name)
+            # within the last threshold positions, or the first threshold
+            if (
+                position_count - position <= threshold
+                if from_end
+                else position < threshold
+            ):
+                probability_points += 1
+
+        return probability_points / total_points >= probability_threshold
 
     def is_probably_their_twix_post(self, extracted_image_texts: list[str]) -> bool:
         """
@@ -272,21 +709,55 @@ class TweetCompiler:
             extracted_image_texts,
         )
 
+    def is_probably_a_screenshot(self, image: Any) -> bool:
+        """
+        Judge an embedded image by the dimensions Bluesky already tells us about,
+        so we don't download and OCR ones that can't be a post screenshot
+        """
+        if not image.aspect_ratio:
+            # older posts don't have dimensions; let the OCR decide
+            return True
+
+        width, height = image.aspect_ratio.width, image.aspect_ratio.height
+        min_ratio, max_ratio = self.screenshot_aspect_ratio_range
+        # aspect_ratio is only a ratio (it isn't always the pixel size), so
+        # the shape is all we can go on
+        return height > 0 and min_ratio <= width / height <= max_ratio
+
+    def probably_has_post_text(self, image: np.ndarray) -> bool:
+        """
+        Run just the text detector over a shrunken copy of the image, which is a
+        lot cheaper than reading it, to skip photos and memes that don't have
+        enough text in them to be a post screenshot
+        """
+        scale = self.text_detection_thumbnail_size / min(image.shape[:2])
+        if scale >= 1:
+            # small enough that reading it isn't much more work than checking
+            return True
+
+        thumbnail = cv2.resize(
+            image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
+        with OCR_LOCK:
+            horizontal_boxes, free_boxes = self.image_reader.detect(thumbnail)
+        return (
+            len(horizontal_boxes[0]) + len(free_boxes[0])
+            >= self.min_screenshot_text_regions
+        )
+
     def clean_extracted_texts(self, extracted_texts: list[str]) -> list[str]:
         # TODO: finish removing "Trending", numbers, dates, and timestamps
         # stuff like 3/4/25,10:13 AM is still common
         cleaned_texts = []
         for text in extracted_texts:
-            for identifier, info in chain(
-                self.untruth_social_generics.items(), self.twix_generics.items()
-            ):
-                if info.regex:
-                    text = re.sub(info.regex.rstrip("$"), "", text.strip())
-                else:
-                    text = text.replace(identifier, "")
+            text = text.strip()
+            if count_match := self.count_text_cleaning_regex.match(text):
+                text = text[count_match.end() :]
+            text = self.text_cleaning_regex.sub("", text)
+            text = self.literal_text_cleaning_regex.sub("", text).strip()
 
             # Attempt to filter out dates, but only try if there is a number
-            if re.search("\d", text):
+            if HAS_A_NUMBER_REGEX.search(text):
                 try:
                     its_just_a_number = float(text)
                 except (ValueError, OverflowError):
@@ -295,106 +766,394 @@ class TweetCompiler:
                     if its_just_a_number:
                         continue
 
-                try:
-                    # dateutil is AMAZING but it does not like the AM/PM apparently
-                    maybe_a_date = attempt_to_parse_date(
-                        re.sub("am|pm", "", text.lower())
-                    )
-                except (ParserError, OverflowError):
-                    pass
-                else:
-                    if maybe_a_date:
-                        continue
-
-            for other_regex in OTHER_REGEXES_TO_CLEAN:
-                text = re.sub(other_regex, "", text)
+                # dateutil is AMAZING but it does not like the AM/PM apparently
+                date_text = text.lower().replace("am", "").replace("pm", "")
+                date_words = WORD_REGEX.findall(date_text)
+                if all(
+                    word in DATEUTIL_WORDS or (index and date_words[index - 1] == "of")
+                    for index, word in enumerate(date_words)
+                ):
+                    try:
+                        maybe_a_date = attempt_to_parse_date(date_text)
+                    except (ParserError, OverflowError):
+                        pass
+                    else:
+                        if maybe_a_date:
+                            continue
 
             if text:
                 cleaned_texts.append(text)
 
         return cleaned_texts
 
-    def get_tweet_text_if_confident(self, image_url: str) -> Union[str, None]:
-        extracted_texts = []
+    def download_image(self, image_url: str) -> Optional[np.ndarray]:
         try:
-            reader_output = self.image_reader.readtext(image_url)
-        except HTTPError:
+            response = self.http_client.get(image_url)
+            response.raise_for_status()
+        except httpx.HTTPError:
             return None
 
-        for _, text, confidence_level in reader_output:
-            if confidence_level >= self.ocr_probability_threshold:
-                extracted_texts.append(text)
+        # decodes to the same BGR layout the OCR reader would have made itself
+        return cv2.imdecode(
+            np.frombuffer(response.content, dtype=np.uint8), cv2.IMREAD_COLOR
+        )
+
+    def get_tweet_text_from_reader_output(
+        self, reader_output: list[tuple[Any, str, float]]
+    ) -> Union[str, None]:
+        extracted_texts = [
+            text
+            for _, text, confidence_level in reader_output
+            if confidence_level >= self.ocr_probability_threshold
+        ]
 
         if self.is_probably_their_tweet(extracted_texts):
             cleaned_extracted_texts = self.clean_extracted_texts(extracted_texts)
             return " ".join(cleaned_extracted_texts)
         return None
 
-    def _get_tweets_list_from_api_call(
-        self, getter_func: Callable, *getter_args, **getter_kwargs
-    ) -> list[str]:
+    def start_downloading_images(self, image_urls: list[str]) -> list[Optional[Future]]:
+        """
+        Start downloading (in the background) every image we don't already have
+        a cached answer for; those get None instead of a download. Repeats of
+        the same image share one download.
+        """
+        image_downloads: dict[str, Future] = {}
+        for image_url in image_urls:
+            key = self.tweet_text_cache.get_key(image_url)
+            if key not in image_downloads:
+                if self.tweet_text_cache.get(image_url) is not NOT_CACHED:
+                    continue
+                image_downloads[key] = self.image_download_pool.submit(
+                    self.download_image, image_url
+                )
+        return [
+            image_downloads.get(self.tweet_text_cache.get_key(image_url))
+            for image_url in image_urls
+        ]
+
+    def get_tweet_texts_if_confident(
+        self,
+        image_urls: list[str],
+        image_downloads: Optional[list[Optional[Future]]] = None,
+    ) -> list[Union[str, None]]:
+        """
+        OCR a batch of images in one go, returning the tweet text (or None) for
+        each url in the same order as the urls. Images we've already read are
+        answered from the cache instead.
+
+        Pass in image_downloads from start_downloading_images to reuse
+        downloads that were started earlier.
+        """
+        if image_downloads is None:
+            image_downloads = self.start_downloading_images(image_urls)
+
+        tweet_texts: list[Union[str, None]] = [None] * len(image_urls)
+        # repeats of an image share a download, and only need reading once
+        indexes_by_download: dict[Future, list[int]] = {}
+        for index, (image_url, image_download) in enumerate(
+            zip(image_urls, image_downloads)
+        ):
+            if image_download is None:
+                cached_tweet_text = self.tweet_text_cache.get(image_url)
+                if cached_tweet_text is not LOOKS_TEXTLESS:
+                    tweet_texts[index] = cached_tweet_text
+            else:
+                indexes_by_download.setdefault(image_download, []).append(index)
+
+        images = {}
+        for image_download, indexes in indexes_by_download.items():
+            image = image_download.result()
+            if image is None:
+                continue
+            image_url = image_urls[indexes[0]]
+            # whether it looks like there's any text is only a guess from a
+            # thumbnail, so one the detector passed on before (that's turned up
+            # again, like in a repost) gets read properly this time
+            passed_on_before = self.tweet_text_cache.looked_textless(image_url)
+            if passed_on_before or self.probably_has_post_text(image):
+                images[image_download] = image
+            else:
+                self.tweet_text_cache.set_looks_textless(image_url)
+
+        if not images:
+            return tweet_texts
+
+        if len(images) < self.min_ocr_batch_size:
+            with OCR_LOCK:
+                reader_outputs = [
+                    self.image_reader.readtext(image) for image in images.values()
+                ]
+        else:
+            # The reader can only batch images of the same size, and squashing
+            # screenshots to one fixed size wrecks the OCR, so pad them out instead.
+            # Repeating the edge pixels keeps light and dark mode backgrounds blank.
+            batch_height = max(image.shape[0] for image in images.values())
+            batch_width = max(image.shape[1] for image in images.values())
+            padded_images = [
+                cv2.copyMakeBorder(
+                    image,
+                    0,
+                    batch_height - image.shape[0],
+                    0,
+                    batch_width - image.shape[1],
+                    cv2.BORDER_REPLICATE,
+                )
+                for image in images.values()
+            ]
+            with OCR_LOCK:
+                reader_outputs = self.image_reader.readtext_batched(padded_images)
+
+        for image_download, reader_output in zip(images, reader_outputs):
+            tweet_text = self.get_tweet_text_from_reader_output(reader_output)
+            indexes = indexes_by_download[image_download]
+            for index in indexes:
+                tweet_texts[index] = tweet_text
+            # failed downloads aren't cached, so feeds don't move their stopping
+            # point past them and they get another go next time
+            self.tweet_text_cache.set(image_urls[indexes[0]], tweet_text)
+        return tweet_texts
+
+    def get_tweet_text_if_confident(self, image_url: str) -> Union[str, None]:
+        return self.get_tweet_texts_if_confident([image_url])[0]
+
+    def _prefetch_api_pages(
+        self,
+        first_response: Any,
+        cursor_in_params: bool,
+        max_pages: int,
+        getter_func: Callable,
+        *getter_args,
+        **getter_kwargs,
+    ) -> Iterator[Any]:
+        """
+        Yield API response pages, fetching the next few pages in a background
+        thread so network round trips overlap with OCR-ing the current page
+        """
+        pages: Queue = Queue(maxsize=self.page_prefetch_count)
+        stop_fetching = Event()
+
+        def put_page(page: Any) -> bool:
+            # don't block forever if whoever was consuming pages gave up
+            while not stop_fetching.is_set():
+                try:
+                    pages.put(page, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def fetch_pages() -> None:
+            response = first_response
+            pages_fetched = 1
+            try:
+                while put_page(response):
+                    next_page = response.cursor
+                    if not next_page or pages_fetched > max_pages:
+                        break
+                    if cursor_in_params:
+                        getter_kwargs["params"].cursor = next_page
+                    else:
+                        getter_kwargs["cursor"] = next_page
+                    response = getter_func(*getter_args, **getter_kwargs)
+                    pages_fetched += 1
+            except Exception as e:
+                put_page(e)
+            finally:
+                put_page(NO_MORE_PAGES)
+
+        Thread(target=fetch_pages, daemon=True).start()
+        try:
+            while (page := pages.get()) is not NO_MORE_PAGES:
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            stop_fetching.set()
+
+    def _iter_image_urls_from_api_call(
+        self,
+        feed: str,
+        read_posts: list[tuple[str, list[str]]],
+        max_pages: int,
+        getter_func: Callable,
+        *getter_args,
+        **getter_kwargs,
+    ) -> Iterator[str]:
+        """
+        Yield the feed's screenshot urls, newest first, until reaching where it
+        was read up to last time. Each post's uri and screenshot urls go in
+        read_posts as they're yielded, for working out where to stop next time
+        """
+        stop_post_uri = self.tweet_text_cache.get_feed_stop(feed)
+        caught_up = False
+        page: Any = None
         response = getter_func(*getter_args, **getter_kwargs)
-        feed_response = getattr(response, "feed", None)
-        posts_response = getattr(response, "posts", None)
-        if feed_response is not None:
-            items = feed_response
-            post_attr = "post"
+        # figure out the response shape once, not for every post on every page
+        get_posts: Callable[[Any], Iterable[Any]]
+        if getattr(response, "feed", None) is not None:
+            get_posts = lambda page: (item.post for item in page.feed)
             cursor_in_params = False
-        elif posts_response is not None:
-            items = posts_response
+        elif getattr(response, "posts", None) is not None:
             # each thing we itereate is already a post
-            # I want to use None but it makes mypy yell so something here, have
-            # something falsy that won't make mypy yell 😣:
-            post_attr = ""
+            get_posts = attrgetter("posts")
             cursor_in_params = True
         else:
             raise ValueError(f"Unkown API response format: response ({type(response)})")
 
-        tweets_list = []
-        pages_seen = 0
-        while pages_seen <= self.max_pages:
-            for item in items:  # for post in response.posts
-                post = getattr(item, post_attr) if post_attr else item
-                if post and post.embed and hasattr(post.embed, "images"):
-                    for image in post.embed.images:
-                        tweet_text = self.get_tweet_text_if_confident(image.fullsize)
-                        if tweet_text is not None:
-                            tweets_list.append(tweet_text)
-
-            pages_seen += 1
-            next_page = response.cursor
-            if next_page:
-                if cursor_in_params:
-                    getter_kwargs["params"].cursor = next_page
-                else:
-                    getter_kwargs["cursor"] = next_page
-                response = getter_func(*getter_args, **getter_kwargs)
-            else:
+        for page in self._prefetch_api_pages(
+            response,
+            cursor_in_params,
+            max_pages,
+            getter_func,
+            *getter_args,
+            **getter_kwargs,
+        ):
+            page_image_urls = []
+            for post in get_posts(page):
+                # feeds are newest first, so everything from here on was read on
+                # an earlier run; iter_all_tweets gets those from the cache instead
+                if post.uri == stop_post_uri:
+                    caught_up = True
+                    break
+                post_image_urls = []
+                # most embeds (links, quote posts, video) have no images at all
+                images = getattr(getattr(post, "embed", None), "images", None)
+                for image in images or ():
+                    if self.is_probably_a_screenshot(image):
+                        post_image_urls.append(image.fullsize)
+                read_posts.append((post.uri, post_image_urls))
+                page_image_urls.extend(post_image_urls)
+
+            yield from page_image_urls
+            if caught_up:
                 break
 
-        return tweets_list
+        # if max_pages cut the feed short there's a gap between here and the old
+        # stopping point that nobody's read, so keep stopping at the old one by
+        # not owning up to reading anything
+        if not caught_up and page is not None and page.cursor:
+            read_posts.clear()
 
-    def get_tweets_list_from_account(self, account: str) -> list[str]:
-        return self._get_tweets_list_from_api_call(self.client.get_author_feed, account)
+    def _iter_tweets_from_api_call(
+        self,
+        feed: str,
+        max_pages: int,
+        getter_func: Callable,
+        *getter_args,
+        **getter_kwargs,
+    ) -> Iterator[str]:
+        read_posts: list[tuple[str, list[str]]] = []
+        image_urls = self._iter_image_urls_from_api_call(
+            feed,
+            read_posts,
+            max_pages,
+            getter_func,
+            *getter_args,
+            **getter_kwargs,
+        )
+        # batches can span pages so the reader always gets a full one
+        batches = (
+            (image_url_batch, self.start_downloading_images(image_url_batch))
+            for image_url_batch in iter(
+                lambda: list(islice(image_urls, self.ocr_batch_size)), []
+            )
+        )
+        batch = next(batches, None)
+        while batch is not None:
+            # start downloading the next batch while this one is being OCR'd
+            next_batch = next(batches, None)
+            for tweet_text in self.get_tweet_texts_if_confident(*batch):
+                if tweet_text is not None:
+                    yield tweet_text
+            batch = next_batch
+
+        # next time, stop at the newest post that it and everything under it
+        # have been dealt with, so anything above that (like an image that
+        # failed to download) gets another go
+        new_stop_post_uri = None
+        for post_uri, post_image_urls in reversed(read_posts):
+            if any(
+                self.tweet_text_cache.get(image_url) is NOT_CACHED
+                for image_url in post_image_urls
+            ):
+                break
+            new_stop_post_uri = post_uri
+        if new_stop_post_uri is not None:
+            self.tweet_text_cache.set_feed_stop(feed, new_stop_post_uri)
+
+    def iter_tweets_from_account(self, account: str) -> Iterator[str]:
+        return self._iter_tweets_from_api_call(
+            account,
+            self.max_pages,
+            self.client.get_author_feed,
+            account,
+            limit=self.page_size,
+        )
 
-    def get_tweets_list_from_hashtag(self, hashtag: str) -> list[str]:
+    def iter_tweets_from_hashtag(self, hashtag: str) -> Iterator[str]:
         # There is a tag parameter but it does not seem to work:
         # https://www.reddit.com/r/BlueskySocial/comments/1h00922/trying_to_query_api_programmatically_cant_search/
-        return self._get_tweets_list_from_api_call(
+        return self._iter_tweets_from_api_call(
+            f"#{hashtag}",
+            self.max_hashtag_pages,
             self.client.app.bsky.feed.search_posts,
             params=AppBskyFeedSearchPosts.Params(
                 q=f"#{hashtag}",
                 sort="latest",
+                limit=self.page_size,
             ),
         )
 
+    def iter_all_tweets(self) -> Iterator[str]:
+        """
+        Yield each hashtag's and account's tweets (in that order) as they're
+        found, so callers don't have to wait for every feed or hold all of
+        their results at once. Then yield the tweets earlier runs found that
+        the feeds stopped short of this time
+        """
+        feeds = [
+            *(partial(self.iter_tweets_from_hashtag, tag) for tag in self.hashtags),
+            *(partial(self.iter_tweets_from_account, acct) for acct in self.accounts),
+        ]
+        # feeds read ahead of the one being yielded from pile up here until
+        # it's their turn
+        feed_tweets: list[Queue] = [Queue() for _ in feeds]
+        stop_reading = Event()
+
+        def read_feed(feed: Callable[[], Iterator[str]], tweets: Queue) -> None:
+            try:
+                for tweet in feed():
+                    # whoever wanted these gave up
+                    if stop_reading.is_set():
+                        return
+                    tweets.put(tweet)
+            except Exception as e:
+                tweets.put(e)
+            finally:
+                tweets.put(NO_MORE_TWEETS)
+
+        found_tweets = set()
+        feed_pool = ThreadPoolExecutor(max_workers=self.feed_workers)
+        try:
+            for feed, tweets in zip(feeds, feed_tweets):
+                feed_pool.submit(read_feed, feed, tweets)
+            for tweets in feed_tweets:
+                while (tweet := tweets.get()) is not NO_MORE_TWEETS:
+                    if isinstance(tweet, Exception):
+                        raise tweet
+                    found_tweets.add(tweet)
+                    yield tweet
+        finally:
+            stop_reading.set()
+            feed_pool.shutdown(cancel_futures=True)
+
+        for tweet_text in self.tweet_text_cache.iter_tweet_texts():
+            if tweet_text not in found_tweets:
+                yield tweet_text
+
     def get_all_tweets(self) -> list[str]:
-        all_tweets = []
-        for hashtag in self.hashtags:
-            all_tweets.extend(self.get_tweets_list_from_hashtag(hashtag))
-        for account in self.accounts:
-            all_tweets.extend(self.get_tweets_list_from_account(account))
-        return all_tweets
+        return list(self.iter_all_tweets())
 
 
 class TrumpTweetCompiler(TweetCompiler):
@@ -446,29 +1205,92 @@ TWEET_COMPILER_CLASSES = frozenset(
 )
 
 
-def dedupe_combined_tweets_list(combined_tweets_list: list[str]) -> list[str]:
+def iter_deduped_tweets(tweets: Iterable[str]) -> Iterator[str]:
+    """
+    Yield each tweet that isn't a (fuzzy) repeat of one already yielded, as
+    they come, so the tweets don't all have to be collected first
+    """
     deduped_tweets_list: list[str] = []
-    for tweet in combined_tweets_list:
-        is_duplicate = False
-        for deduped in deduped_tweets_list:
-            if fuzz.ratio(tweet, deduped) >= TWEET_DEDUPE_FUZZY_MATCH_THRESHOLD:
-                is_duplicate = True
-                break
-        if not is_duplicate:
-            deduped_tweets_list.append(tweet)
+    seen_tweet_digests: set[bytes] = set()
+    # LSH bucket -> indexes in deduped_tweets_list
+    lsh_buckets: dict[tuple[int, bytes], list[int]] = {}
+    for tweet in tweets:
+        # The same screenshot tends to get posted over and over, and exact
+        # repeats are cheap to spot, so save the fuzzy matching for new ones
+        tweet_digest = hashlib.blake2b(
+            tweet.strip().lower().encode(), digest_size=8
+        ).digest()
+        if tweet_digest in seen_tweet_digests:
+            continue
+        seen_tweet_digests.add(tweet_digest)
+
+        band_keys = get_lsh_band_keys(
+            get_tweet_character_minhash(tweet), TWEET_DEDUPE_LSH_BANDS
+        )
+        # dict to drop repeats but keep order, so ties go to the earliest tweet
+        candidate_indices = dict.fromkeys(
+            chain.from_iterable(lsh_buckets.get(key, []) for key in band_keys)
+        )
+        # None when nothing we've kept is close enough; the cutoff also lets
+        # rapidfuzz skip candidates whose lengths alone rule them out
+        close_match = process.extractOne(
+            tweet,
+            [deduped_tweets_list[index] for index in candidate_indices],
+            scorer=fuzz.ratio,
+            score_cutoff=TWEET_DEDUPE_FUZZY_MATCH_THRESHOLD,
+        )
+        if close_match is not None:
+            continue
 
-    return deduped_tweets_list
+        for key in band_keys:
+            lsh_buckets.setdefault(key, []).append(len(deduped_tweets_list))
+        deduped_tweets_list.append(tweet)
+        yield tweet
 
 
-def get_villain_quotes_list(max_count: int) -> list[str]:
-    # The dict keys were just for reference in case anyone was curious :P
-    all_quotes = [quote for quotes in VILLAIN_QUOTES.values() for quote in quotes]
-    return random.sample(all_quotes, min([len(all_quotes), max_count]))
+def dedupe_combined_tweets_list(combined_tweets_list: list[str]) -> list[str]:
+    return list(iter_deduped_tweets(combined_tweets_list))
 
 
-# I figured this variable would make a terrible first impression on repo
-# viewers if I put it at the very top :)
-MY_DUMB_INFINITE_LOOP_PREVENTER = 1000
+def get_tweet_character_minhash(tweet: str) -> np.ndarray:
+    """
+    MinHash of a tweet's (UTF-8 byte) character shingles. There are a lot more
+    of those than word shingles, so instead of hashing each one as a string,
+    pack each shingle's bytes into a number with numpy. That's already a fine
+    hash and (up to 3 bytes) small enough for the permutations.
+    """
+    size = TWEET_DEDUPE_CHARACTER_SHINGLE_SIZE
+    encoded = np.frombuffer(tweet.lower().encode(), dtype=np.uint8).astype(np.uint64)
+    if len(encoded) < size:
+        encoded = np.pad(encoded, (0, size - len(encoded)))
+
+    shingle_count = len(encoded) - size + 1
+    shingles = np.zeros(shingle_count, dtype=np.uint64)
+    for offset in range(size):
+        shingles = (shingles << np.uint64(8)) | encoded[offset : offset + shingle_count]
+    return get_minhash(np.unique(shingles))
+
+
+def get_minhash(shingle_hashes: np.ndarray) -> np.ndarray:
+    # 32 bit hashes times 31 bit multipliers can't overflow 64 bits
+    permuted_hashes = (np.outer(shingle_hashes, MINHASH_A) + MINHASH_B) % MINHASH_PRIME
+    return permuted_hashes.min(axis=0)
+
+
+def get_lsh_band_keys(minhash: np.ndarray, bands: int) -> list[tuple[int, bytes]]:
+    """
+    Split a MinHash into bands; tweets with any band key in common are likely
+    similar. Leftover values that don't fill a band are ignored.
+    """
+    rows_per_band = len(minhash) // bands
+    return [
+        (band, minhash[band * rows_per_band : (band + 1) * rows_per_band].tobytes())
+        for band in range(bands)
+    ]
+
+
+def get_villain_quotes_list(max_count: int) -> list[str]:
+    return random.sample(ALL_VILLAIN_QUOTES, min([len(ALL_VILLAIN_QUOTES), max_count]))
 
 
 def create_combined_corpus(
@@ -479,34 +1301,36 @@ def create_combined_corpus(
     single string corpus. Same idea as different_from_me_should repo.
     """
     num_tweets = len(full_tweets_list)
-    seen_neighbor_indices = set()
-    there_just_isnt_enough = 0
-    for quote in villain_quotes_list:
-        index_to_insert_at = random.randrange(num_tweets)
-        while (
-            index_to_insert_at in seen_neighbor_indices
-            and there_just_isnt_enough < MY_DUMB_INFINITE_LOOP_PREVENTER
-        ):
-            there_just_isnt_enough += 1
-            index_to_insert_at = random.randrange(num_tweets)
-        # We don't want the quotes to end up too close together, so make a
-        # decent range of indices around the current insert point become
-        # off-limits. The negatives shouldn't do any harm here.
-        seen_neighbor_indices.update(
-            [
-                *range(
-                    index_to_insert_at - QUOTE_INSERTION_WINDOW_SIZE,
-                    index_to_insert_at,
-                ),
-                *range(
-                    index_to_insert_at,
-                    index_to_insert_at + QUOTE_INSERTION_WINDOW_SIZE,
-                ),
-            ]
+    num_quotes = len(villain_quotes_list)
+    if num_quotes > num_tweets:
+        # there's no spreading these out, so just put them anywhere
+        insertion_indices = sorted(random.choices(range(num_tweets), k=num_quotes))
+    else:
+        # We don't want the quotes to end up too close together, so keep them a
+        # decent number of tweets apart (or as far as there's room for). Picking
+        # from a range shrunk by all of the gaps and then spreading the picks
+        # back out does that in one go, with every spacing equally likely.
+        gap = max(1, min(QUOTE_INSERTION_WINDOW_SIZE, num_tweets // max(1, num_quotes)))
+        picks = random.sample(
+            range(num_tweets - (num_quotes - 1) * (gap - 1)), num_quotes
         )
-        full_tweets_list.insert(index_to_insert_at, quote)
-
-    return " ".join(full_tweets_list)
+        insertion_indices = [
+            pick + nth_pick * (gap - 1) for nth_pick, pick in enumerate(sorted(picks))
+        ]
+
+    # Merge the quotes in on the way to the string rather than inserting them
+    # into full_tweets_list, which is slow and would leave this round's quotes
+    # in the caller's list (and so in the next corpus made from it too)
+    quote_insertions = iter(zip(insertion_indices, villain_quotes_list))
+    next_insertion = next(quote_insertions, None)
+    combined = []
+    for index, tweet in enumerate(full_tweets_list):
+        while next_insertion is not None and next_insertion[0] == index:
+            combined.append(next_insertion[1])
+            next_insertion = next(quote_insertions, None)
+        combined.append(tweet)
+
+    return " ".join(combined)
 
 
 def format_tweet_compiler_nicknames() -> str: